@@ -1,9 +1,10 @@
-import os
 import re
-import subprocess
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+from fontTools.subset import Options, Subsetter, load_font, save_font
+
 # Configuration
 EGUI_ROOT = Path(__file__).parent.parent
 SRC_DIR = EGUI_ROOT / "src"
@@ -26,29 +27,54 @@ DEFAULT_CHARS = (
     "™©®·…—"  # Common symbols
 )
 
-def extract_chars_from_file(file_path):
+# Once all of these are collected, ASCII-only files cannot add new glyphs,
+# since ASCII control characters are dropped before subsetting
+PRINTABLE_ASCII = frozenset(chr(c) for c in range(0x20, 0x7F))
+
+# Patterns run on raw bytes to skip decoding whole files; only matches are decoded
+# Match string literals in Rust: "..." or r"..." or r#"..."#
+# This is a bit simplified but usually captures most UI strings
+STR_RE = re.compile(rb'"([^"\\]*(?:\\.[^"\\]*)*)"')
+# Match char literals: '...' (a single UTF-8 encoded char or an escape)
+CHAR_RE = re.compile(rb"'([^'\\\x80-\xff]|[\xc0-\xff][\x80-\xbf]{1,3}|\\.)'")
+
+def extract_chars_from_file(file_path, skip_ascii=False):
     chars = set()
     try:
-        content = file_path.read_text(encoding="utf-8")
-        # Match string literals in Rust: "..." or r"..." or r#"..."#
-        # This is a bit simplified but usually captures most UI strings
-        matches = re.findall(r'"([^"\\]*(?:\\.[^"\\]*)*)"', content)
-        for m in matches:
-            chars.update(m)
+        content = file_path.read_bytes()
+        if skip_ascii and content.isascii():
+            return chars
+        # Join all literal text first so the set is updated in one pass
+        literals = b"".join(m.group(1) for m in STR_RE.finditer(content))
+        chars.update(literals.decode("utf-8", errors="ignore"))
         
-        # Match char literals: '...'
-        char_matches = re.findall(r"'([^'\\]|\\.)'", content)
-        for m in char_matches:
-            # Handle escape sequences like \n, \t, etc.
-            if len(m) == 1:
-                chars.add(m)
-            elif m.startswith('\\'):
-                # We mainly care about the literal characters for CJK
-                pass
+        # Escape sequences like \n, \t, etc. are skipped; we mainly care
+        # about the literal characters for CJK
+        for m in CHAR_RE.finditer(content):
+            if not m.group(1).startswith(b"\\"):
+                chars.update(m.group(1).decode("utf-8", errors="ignore"))
     except Exception as e:
         print(f"Warning: Failed to read {file_path}: {e}")
     return chars
 
+def subset_one(font_path, text_to_subset, output_path):
+    # layout_features='*': keep kerning, etc.
+    # ignore_missing_unicodes: don't error if a char is missing
+    options = Options()
+    options.layout_features = ["*"]
+    subsetter = Subsetter(options=options)
+    subsetter.populate(text=text_to_subset)
+
+    # Load and save like pyftsubset so head.modified and bounds are kept as-is
+    font = load_font(font_path, options, dontLoadGlyphNames=True)
+    subsetter.subset(font)
+    save_font(font, output_path, options)
+    font.close()
+
+    orig_size = font_path.stat().st_size
+    new_size = output_path.stat().st_size
+    return orig_size, new_size
+
 def main():
     if not SRC_DIR.exists():
         print(f"Error: {SRC_DIR} not found. Run from the project root (apps/nesium-egui).")
@@ -58,62 +84,43 @@ def main():
     all_chars = set(DEFAULT_CHARS)
     
     # Scan src directory
-    for root, _, files in os.walk(SRC_DIR):
-        for file in files:
-            if file.endswith(".rs"):
-                file_path = Path(root) / file
-                all_chars.update(extract_chars_from_file(file_path))
-
-    # Remove duplicates and sort
-    text_to_subset = "".join(sorted(list(all_chars)))
+    for file_path in SRC_DIR.rglob("*.rs"):
+        ascii_saturated = PRINTABLE_ASCII <= all_chars
+        all_chars.update(extract_chars_from_file(file_path, skip_ascii=ascii_saturated))
+
+    # Drop ASCII control characters picked up from multi-line literals; the
+    # subsetter only needs the set of codepoints, so skip sorting
+    text_to_subset = "".join(c for c in all_chars if c in PRINTABLE_ASCII or c > "\x7f")
     
     # Ensure output directory exists
     SUBSET_OUT_DIR.mkdir(parents=True, exist_ok=True)
-    
-    # Write characters to a temporary file for pyftsubset
-    chars_file = EGUI_ROOT / "tool" / "used_chars.txt"
-    chars_file.write_text(text_to_subset, encoding="utf-8")
-    
+
     print(f"Total unique characters found: {len(text_to_subset)}")
-    print(f"Characters saved to {chars_file}")
 
-    for font_name in ASSETS_FONTS:
-        font_path = FLUTTER_FONTS_DIR / font_name
-        if not font_path.exists():
-            print(f"Warning: Source font {font_path} not found, skipping.")
-            continue
+    # Fonts are independent, so subset them concurrently
+    with ProcessPoolExecutor(max_workers=len(ASSETS_FONTS)) as executor:
+        futures = {}
+        for font_name in ASSETS_FONTS:
+            font_path = FLUTTER_FONTS_DIR / font_name
+            if not font_path.exists():
+                print(f"Warning: Source font {font_path} not found, skipping.")
+                continue
 
-        output_path = SUBSET_OUT_DIR / font_name
-        
-        print(f"Subsetting {font_name}...")
-        try:
-            # Run pyftsubset via the module to avoid launcher issues on Windows
-            # --text-file: include chars from file
-            # --layout-features='*': keep kerning, etc.
-            # --no-ignore-missing-glyphs: don't error if a char is missing
-            subprocess.run([
-                sys.executable,
-                "-m",
-                "fontTools.subset",
-                str(font_path),
-                f"--text-file={chars_file}",
-                "--layout-features=*",
-                f"--output-file={output_path}"
-            ], check=True)
-            
-            orig_size = font_path.stat().st_size
-            new_size = output_path.stat().st_size
-            reduction = (orig_size - new_size) / orig_size * 100
-            
-            print(f"  Success: {orig_size / 1024 / 1024:.1f} MB -> {new_size / 1024:.1f} KB ({reduction:.1f}% reduction)")
-            
-        except subprocess.CalledProcessError as e:
-            print(f"Error: pyftsubset failed for {font_name}: {e}")
-        except Exception as e:
-            print(f"Error: {e}")
-
-    if chars_file.exists():
-        chars_file.unlink()
+            output_path = SUBSET_OUT_DIR / font_name
+            print(f"Subsetting {font_name}...")
+            future = executor.submit(subset_one, font_path, text_to_subset, output_path)
+            futures[future] = font_name
+
+        for future in as_completed(futures):
+            font_name = futures[future]
+            try:
+                orig_size, new_size = future.result()
+                reduction = (orig_size - new_size) / orig_size * 100
+
+                print(f"  Success: {font_name}: {orig_size / 1024 / 1024:.1f} MB -> {new_size / 1024:.1f} KB ({reduction:.1f}% reduction)")
+
+            except Exception as e:
+                print(f"Error: subsetting failed for {font_name}: {e}")
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,11 @@
 import os
 import re
-import subprocess
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+from fontTools.subset import Options, Subsetter, load_font, save_font
+
 # Configuration
 FONTS_DIR = Path("assets/fonts")
 LIB_DIR = Path("lib")
@@ -22,29 +24,57 @@ DEFAULT_CHARS = (
     "™©®·…—"  # Common symbols
 )
 
-def extract_chars_from_file(file_path):
+# Once all of these are collected, ASCII-only files cannot add new glyphs,
+# since ASCII control characters are dropped before subsetting
+PRINTABLE_ASCII = frozenset(chr(c) for c in range(0x20, 0x7F))
+
+# Patterns run on raw bytes to skip decoding whole files; only matches are decoded
+# For .arb (JSON): simple match for everything inside quotes to be safe
+ARB_STR_RE = re.compile(rb'"([^"\\]*(?:\\.[^"\\]*)*)"')
+# For .dart: match single quotes, double quotes, and triple quotes
+# Note: This is a bit simplified but usually captures most UI strings
+DART_STR_RE = re.compile(rb"'(.*?)'|\"(.*?)\"", re.DOTALL)
+
+def extract_chars_from_file(file_path, skip_ascii=False):
     chars = set()
     try:
-        content = file_path.read_text(encoding="utf-8")
+        content = file_path.read_bytes()
+        if skip_ascii and content.isascii():
+            return chars
         # For .arb (JSON), extract all values
         if file_path.suffix == ".arb":
-            # Simple match for everything inside quotes to be safe
-            matches = re.findall(r'"([^"\\]*(?:\\.[^"\\]*)*)"', content)
-            for m in matches:
-                chars.update(m)
+            literals = b"".join(m.group(1) for m in ARB_STR_RE.finditer(content))
         # For .dart, extract string literals
         elif file_path.suffix == ".dart":
-            # Match single quotes, double quotes, and triple quotes
-            # Note: This is a bit simplified but usually captures most UI strings
-            matches = re.findall(r"'(.*?)'|\"(.*?)\"", content, re.DOTALL)
-            for m in matches:
-                for group in m:
-                    if group:
-                        chars.update(group)
+            # lastindex is whichever quote style matched
+            literals = b"".join(m.group(m.lastindex) for m in DART_STR_RE.finditer(content))
+        else:
+            literals = b""
+        chars.update(literals.decode("utf-8", errors="ignore"))
     except Exception as e:
         print(f"Warning: Failed to read {file_path}: {e}")
     return chars
 
+def subset_one(font_path, text_to_subset, output_path):
+    # layout_features='*': keep kerning, etc.
+    options = Options()
+    options.layout_features = ["*"]
+    subsetter = Subsetter(options=options)
+    subsetter.populate(text=text_to_subset)
+
+    # Load and save like pyftsubset so head.modified and bounds are kept as-is
+    font = load_font(font_path, options, dontLoadGlyphNames=True)
+    subsetter.subset(font)
+    save_font(font, output_path, options)
+    font.close()
+
+    orig_size = font_path.stat().st_size
+    new_size = output_path.stat().st_size
+    # Replace original with subset
+    os.replace(output_path, font_path)
+
+    return orig_size, new_size
+
 def main():
     if not LIB_DIR.exists():
         print(f"Error: {LIB_DIR} not found. Run from the project root (apps/nesium_flutter).")
@@ -54,61 +84,41 @@ def main():
     all_chars = set(DEFAULT_CHARS)
     
     # Scan lib directory
-    for root, _, files in os.walk(LIB_DIR):
-        for file in files:
-            if file.endswith(".dart") or file.endswith(".arb"):
-                file_path = Path(root) / file
-                all_chars.update(extract_chars_from_file(file_path))
-
-    # Remove duplicates and sort
-    text_to_subset = "".join(sorted(list(all_chars)))
-    
-    # Write characters to a temporary file for pyftsubset
-    chars_file = Path("tool/used_chars.txt")
-    chars_file.write_text(text_to_subset, encoding="utf-8")
+    for pattern in ("*.dart", "*.arb"):
+        for file_path in LIB_DIR.rglob(pattern):
+            ascii_saturated = PRINTABLE_ASCII <= all_chars
+            all_chars.update(extract_chars_from_file(file_path, skip_ascii=ascii_saturated))
+
+    # Drop ASCII control characters picked up from multi-line literals; the
+    # subsetter only needs the set of codepoints, so skip sorting
+    text_to_subset = "".join(c for c in all_chars if c in PRINTABLE_ASCII or c > "\x7f")
     
     print(f"Total unique characters found: {len(text_to_subset)}")
-    print(f"Characters saved to {chars_file}")
-
-    for font_name in ASSETS_FONTS:
-        font_path = FONTS_DIR / font_name
-        if not font_path.exists():
-            print(f"Warning: Font {font_path} not found, skipping.")
-            continue
-
-        output_path = font_path.with_suffix(".subset.ttf")
-        
-        print(f"Subsetting {font_name}...")
-        try:
-            # Run pyftsubset
-            # --text-file: include chars from file
-            # --layout-features='*': keep kerning, etc.
-            # --glyph-names: keep names
-            # --no-ignore-missing-glyphs: error if a char is missing (optional)
-            subprocess.run([
-                "pyftsubset",
-                str(font_path),
-                f"--text-file={chars_file}",
-                "--layout-features=*",
-                f"--output-file={output_path}"
-            ], check=True)
-            
-            orig_size = font_path.stat().st_size
-            new_size = output_path.stat().st_size
-            reduction = (orig_size - new_size) / orig_size * 100
-            
-            print(f"  Success: {orig_size / 1024:.1f} KB -> {new_size / 1024:.1f} KB ({reduction:.1f}% reduction)")
-            
-            # Replace original with subset
-            os.replace(output_path, font_path)
-            
-        except subprocess.CalledProcessError as e:
-            print(f"Error: pyftsubset failed for {font_name}: {e}")
-        except Exception as e:
-            print(f"Error: {e}")
-
-    if chars_file.exists():
-        chars_file.unlink()
+
+    # Fonts are independent, so subset them concurrently
+    with ProcessPoolExecutor(max_workers=len(ASSETS_FONTS)) as executor:
+        futures = {}
+        for font_name in ASSETS_FONTS:
+            font_path = FONTS_DIR / font_name
+            if not font_path.exists():
+                print(f"Warning: Font {font_path} not found, skipping.")
+                continue
+
+            output_path = font_path.with_suffix(".subset.ttf")
+            print(f"Subsetting {font_name}...")
+            future = executor.submit(subset_one, font_path, text_to_subset, output_path)
+            futures[future] = font_name
+
+        for future in as_completed(futures):
+            font_name = futures[future]
+            try:
+                orig_size, new_size = future.result()
+                reduction = (orig_size - new_size) / orig_size * 100
+
+                print(f"  Success: {font_name}: {orig_size / 1024:.1f} KB -> {new_size / 1024:.1f} KB ({reduction:.1f}% reduction)")
+
+            except Exception as e:
+                print(f"Error: subsetting failed for {font_name}: {e}")
 
 if __name__ == "__main__":
     main()